@@ -1,84 +1,202 @@
+import argparse
+import asyncio
 import zmq
-import json
+import zmq.asyncio
+import msgpack
+import numpy as np
+from numba import njit
 import random
-import time
-from enum import Enum
+from typing import Final
 import math
+import os
+import sys
 
-class Performative(Enum):
-    ANNOUNCE_TASK = "announce_task"
-    BID = "bid"
-    AWARD_TASK = "award_task"
-    NEGOTIATE = "negotiate"
-    COMPLETE_TASK = "complete_task"
-    STARTUP = "startup"
-    MOVEMENT = "movement"
+# Performatives travel as small ints so they pack as msgpack fixints.
+# Values must match the constants in server.py.
+ANNOUNCE_TASK: Final = 1
+BID: Final = 2
+AWARD_TASK: Final = 3
+NEGOTIATE: Final = 4
+COMPLETE_TASK: Final = 5
+STARTUP: Final = 7
+MOVEMENT: Final = 8
+START_BIDDING: Final = 9
+WAIT: Final = 10
+WAITING_FOR_BIDS: Final = 11
+WRONG_TASK: Final = 12
+TASK_COMPLETED: Final = 13
+NO_MORE_TASKS: Final = 14
+MOVEMENT_UPDATED: Final = 15
+ERROR: Final = 16
+MOVEMENT_BATCH: Final = 17
+
+# Same-host runs default to a Unix domain socket; Windows has no ipc:// transport
+DEFAULT_ENDPOINT = "tcp://127.0.0.1:5555" if sys.platform == "win32" else "ipc:///tmp/multirobot.sock"
+ENDPOINT = os.environ.get("MR_ENDPOINT", DEFAULT_ENDPOINT)
+
+def pack(message):
+    return msgpack.packb(message, use_bin_type=True)
+
+def unpack(buf):
+    return msgpack.unpackb(buf, raw=False)
+
+@njit(cache=True)
+def plan_manhattan(x0, y0, x1, y1):
+    # Full path from (x0, y0) to (x1, y1), excluding the start, as an (n, 2) array
+    n = abs(x1 - x0) + abs(y1 - y0)
+    out = np.empty((n, 2), np.int32)
+    dx = 1 if x1 > x0 else -1
+    dy = 1 if y1 > y0 else -1
+    x, y = x0, y0
+    i = 0
+    
+    # R1 prefers horizontal movement first
+    while x != x1:
+        x += dx
+        out[i, 0] = x
+        out[i, 1] = y
+        i += 1
+    while y != y1:
+        y += dy
+        out[i, 0] = x
+        out[i, 1] = y
+        i += 1
+    return out
 
 class RobotAgent:
-    def __init__(self, robot_id="R1"):
+    def __init__(self, robot_id="R1", step_delay=0.0, task_delay=0.0):
         self.robot_id = robot_id
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REQ)
-        self.socket.connect("tcp://localhost:5555")
+        self.context = zmq.asyncio.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.IDENTITY, robot_id.encode())
+        # Tiny bid/award messages: only queue to live connections, keep queues short
+        self.socket.setsockopt(zmq.IMMEDIATE, 1)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.SNDHWM, 16)
+        self.socket.setsockopt(zmq.RCVHWM, 16)
+        self.socket.connect(ENDPOINT)
+        self.next_correlation_id = 0
         self.balance = 10
         self.position = (0, 0)
         self.movement_cost = 0.1
+        self.bid_markup = 0.5
+        self.step_delay = step_delay  # seconds per grid cell, 0 runs at full speed
+        self.task_delay = task_delay  # seconds spent executing a task
+        self._tasks = {}  # task_id -> task, sent once by the server at startup
+        self._task_index = {}
+        self._task_xy = np.empty((0, 2), dtype=np.int32)
+        self._bid_vector = np.empty(0)
+        self._log = []  # (position, balance) per step, written out once per task
+        self._pending_path = []  # cells walked since the last completion report
+        self._current_task = None
+        
+        # Invariant payloads are packed once instead of on every send
+        self._startup_bytes = pack({
+            "sender": robot_id,
+            "performative": STARTUP,
+            "content": None
+        })
+        self._end_bid_bytes = pack({
+            "sender": robot_id,
+            "performative": BID,
+            "content": {
+                "task_id": -1,  # Invalid task ID to trigger end
+                "bid_amount": 0
+            }
+        })
+        
+        # Main-loop dispatch: one dict lookup per server response
+        self._handlers = {
+            NO_MORE_TASKS: self._h_done,
+            ERROR: self._h_err,
+            WRONG_TASK: self._h_wrong_task,
+            AWARD_TASK: self._h_award,
+            TASK_COMPLETED: self._h_task_completed,
+        }
+
+    async def request(self, message):
+        return await self.request_packed(pack(message))
+
+    async def request_packed(self, payload):
+        # Requests carry a correlation id frame; skip any stale replies
+        # until the one matching this request arrives.
+        self.next_correlation_id += 1
+        correlation_id = str(self.next_correlation_id).encode()
+        await self.socket.send_multipart([b"", correlation_id, payload])
+        while True:
+            _, reply_id, reply = await self.socket.recv_multipart()
+            if reply_id == correlation_id:
+                return unpack(reply)
+
+    async def _finalize(self):
+        # A bid for the invalid task id -1 gets the no_more_tasks response
+        return await self.request_packed(self._end_bid_bytes)
+
+    async def notify(self, message):
+        # Notifications have an empty correlation id and get no reply
+        await self.socket.send_multipart([b"", b"", pack(message)])
 
     def calculate_bid(self, task):
         task_pos = task["position"]
         distance = abs(self.position[0] - task_pos[0]) + abs(self.position[1] - task_pos[1])
         movement_cost = distance * self.movement_cost
         
-        total_cost = movement_cost + 0.5
+        total_cost = movement_cost + self.bid_markup
         if total_cost > self.balance:
             return float('inf')
         return total_cost
 
-    def move_one_step(self, current_pos, target_pos):
-        x, y = current_pos
-        tx, ty = target_pos
-        
-        # R1 prefers horizontal movement first
-        if x < tx:
-            return (x + 1, y)
-        elif x > tx:
-            return (x - 1, y)
-        elif y < ty:
-            return (x, y + 1)
-        elif y > ty:
-            return (x, y - 1)
-        return current_pos
+    def set_tasks(self, tasks):
+        # Keep task positions as an array so all bids come from one vector op
+        self._tasks = {task["task_id"]: task for task in tasks}
+        self._task_index = {task["task_id"]: i for i, task in enumerate(tasks)}
+        self._task_xy = np.array([task["position"] for task in tasks], dtype=np.int32).reshape(-1, 2)
+        self._bid_vector = self.calculate_bids()
 
-    def move_to_position(self, target_pos):
+    def calculate_bids(self):
+        # Same cost model as calculate_bid, for every task passed to set_tasks
+        x, y = self.position
+        distance = np.abs(self._task_xy[:, 0] - x) + np.abs(self._task_xy[:, 1] - y)
+        total_cost = distance * self.movement_cost + self.bid_markup
+        total_cost[total_cost > self.balance] = np.inf
+        return total_cost
+
+    def plan_path(self, current_pos, target_pos):
+        return plan_manhattan(current_pos[0], current_pos[1], target_pos[0], target_pos[1])
+
+    async def move_to_position(self, target_pos):
         print(f"\n{self.robot_id} moving from {self.position} to {target_pos}")
+        path = self.plan_path(self.position, target_pos).tolist()
         
-        while self.position != target_pos:
-            # Calculate next step
-            next_pos = self.move_one_step(self.position, target_pos)
-            
+        # The path is reported to the server with the task completion
+        self._pending_path.extend(path)
+        
+        for x, y in path:
             # Update position and balance
-            self.position = next_pos
+            self.position = (x, y)
             self.balance -= self.movement_cost
             
-            # Report movement to server
-            message = {
-                "sender": self.robot_id,
-                "performative": "movement",
-                "content": {
-                    "position": self.position
-                }
-            }
-            self.socket.send_string(json.dumps(message))
-            response = json.loads(self.socket.recv_string())
-            
-            print(f"{self.robot_id} moved to {self.position}. Balance: {self.balance:.1f}")
-            time.sleep(2)  # 2-second delay between movements
+            self._log.append((self.position, self.balance))
+            if self.step_delay:
+                await asyncio.sleep(self.step_delay)
+
+    def flush_log(self):
+        if self._log:
+            sys.stdout.write("".join(f"{self.robot_id} moved to {position}. Balance: {balance:.1f}\n"
+                                     for position, balance in self._log))
+            sys.stdout.flush()
+            self._log.clear()
 
-    def submit_bid(self, task):
-        bid_amount = self.calculate_bid(task)
+    async def submit_bid(self, task):
+        # Bids for every known task are recomputed only when position or balance changes
+        index = self._task_index.get(task["task_id"])
+        if index is None:
+            bid_amount = self.calculate_bid(task)
+        else:
+            bid_amount = float(self._bid_vector[index])
         message = {
             "sender": self.robot_id,
-            "performative": Performative.BID.value,
+            "performative": BID,
             "content": {
                 "task_id": task["task_id"],
                 "bid_amount": bid_amount
@@ -86,174 +204,124 @@ class RobotAgent:
         }
         
         print(f"\n{self.robot_id} bidding {bid_amount:.1f} for task {task['task_id']}")
-        self.socket.send_string(json.dumps(message))
-        response = json.loads(self.socket.recv_string())
+        response = await self.request(message)
         return response
 
-    def execute_task(self, task):
+    async def execute_task(self, task):
         if not task:
             return None
             
         # Move to task location
         target_pos = tuple(task["position"])
-        self.move_to_position(target_pos)
+        await self.move_to_position(target_pos)
+        self.flush_log()
         
         # Execute task
         print(f"\n{self.robot_id} executing task {task['task_id']}: {task['description']}")
-        time.sleep(10)  # 10-second task execution
+        if self.task_delay:
+            await asyncio.sleep(self.task_delay)
         
         # Report task completion
         message = {
             "sender": self.robot_id,
-            "performative": Performative.COMPLETE_TASK.value,
+            "performative": COMPLETE_TASK,
             "content": {
                 "task_id": task["task_id"],
-                "position": self.position
+                "path": self._pending_path,
+                "final_position": self.position
             }
         }
-        self.socket.send_string(json.dumps(message))
-        response = json.loads(self.socket.recv_string())
+        self._pending_path = []
+        response = await self.request(message)
         
         # Update balance with reward
         if "reward" in response["content"]:
             self.balance += response["content"]["reward"]
             print(f"{self.robot_id} completed task. New balance: {self.balance:.1f}")
+        self._bid_vector = self.calculate_bids()
         
         return response
 
-    def run(self):
+    async def _bid_next(self, next_task_id):
+        # Bid on the task the server moved on to, or finish if there is none
+        if next_task_id is None:
+            return await self._finalize()
+        self._current_task = self._tasks[next_task_id]
+        return await self.submit_bid(self._current_task)
+
+    async def _resubmit(self):
+        # Resubmit current state to server
+        if self._current_task:
+            return await self.submit_bid(self._current_task)
+        # If no current task, send startup message again
+        return await self.request_packed(self._startup_bytes)
+
+    async def _h_done(self, response):
+        print(f"\n{self.robot_id} finished all tasks. Final balance: {self.balance:.1f}")
+        print(f"Server reported final balance: {response['content']['final_balance']:.1f}")
+        return None
+
+    async def _h_err(self, response):
+        print(f"\nError from server: {response['content']['message']}")
+        await asyncio.sleep(1)
+        return await self._resubmit()
+
+    async def _h_wrong_task(self, response):
+        self._current_task = self._tasks[response["content"]["correct_task_id"]]
+        return await self.submit_bid(self._current_task)
+
+    async def _h_award(self, response):
+        if response["content"]["winner"] == self.robot_id:
+            # We won the task we just bid on
+            await self.execute_task(self._current_task)
+        # Either way, bid on the next task
+        return await self._bid_next(response["content"]["next_task_id"])
+
+    async def _h_task_completed(self, response):
+        return await self._bid_next(response["content"]["next_task_id"])
+
+    async def _h_unknown(self, response):
+        print(f"\n{self.robot_id} got unexpected performative {response['performative']}")
+        await asyncio.sleep(1)
+        return await self._resubmit()
+
+    async def run(self):
         print(f"\n{self.robot_id} running...")
         
         # Startup synchronization
-        startup_message = {
-            "sender": self.robot_id,
-            "performative": "startup",
-            "content": None
-        }
         print(f"\n{self.robot_id} waiting for other robot to connect...")
         
-        current_task = None
-        
         while True:
-            self.socket.send_string(json.dumps(startup_message))
-            response = json.loads(self.socket.recv_string())
+            response = await self.request_packed(self._startup_bytes)
             
-            if response["performative"] == "start_bidding":
+            if response["performative"] == START_BIDDING:
                 print(f"\n{self.robot_id} starting bidding process")
-                first_task = response["content"]["first_task"]
-                if first_task:
-                    current_task = first_task
-                    response = self.submit_bid(current_task)
+                self.set_tasks(response["content"]["tasks"])
+                response = await self._bid_next(response["content"]["first_task_id"])
                 break
-            elif response["performative"] == "wait":
+            elif response["performative"] == WAIT:
                 print(f"\n{self.robot_id} waiting for other robot...")
-                time.sleep(1)
+                await asyncio.sleep(1)
                 continue
         
-        # Main loop
-        while True:
+        # Main loop: each handler returns the next response, or None once finished
+        while response is not None:
             try:
-                if response["performative"] == "no_more_tasks":
-                    print(f"\n{self.robot_id} finished all tasks. Final balance: {self.balance:.1f}")
-                    print(f"Server reported final balance: {response['content']['final_balance']:.1f}")
-                    break
-                
-                if response["performative"] == "error":
-                    print(f"\nError from server: {response['content']['message']}")
-                    time.sleep(1)
-                    
-                    # Resubmit current state to server
-                    if current_task:
-                        response = self.submit_bid(current_task)
-                    else:
-                        # If no current task, send startup message again
-                        self.socket.send_string(json.dumps(startup_message))
-                        response = json.loads(self.socket.recv_string())
-                    continue
-                
-                if response["performative"] == "wrong_task":
-                    current_task = response["content"]["correct_task"]
-                    response = self.submit_bid(current_task)
-                    continue
-                
-                if response["performative"] == "waiting_for_bids":
-                    if "current_task" in response["content"]:
-                        current_task = response["content"]["current_task"]
-                    time.sleep(0.5)
-                    response = self.submit_bid(current_task)
-                    continue
-                
-                if response["performative"] == Performative.AWARD_TASK.value:
-                    if response["content"]["winner"] == self.robot_id:
-                        # We won the task
-                        task_to_execute = current_task  # Execute current task we just won
-                        task_result = self.execute_task(task_to_execute)
-                        
-                        # Check for next task from response
-                        next_task = response["content"]["next_task"]
-                        
-                        # Check if there are no more tasks
-                        if next_task is None:
-                            # Send a final bid to get the no_more_tasks response
-                            dummy_message = {
-                                "sender": self.robot_id,
-                                "performative": Performative.BID.value,
-                                "content": {
-                                    "task_id": -1,  # Invalid task ID to trigger end
-                                    "bid_amount": 0
-                                }
-                            }
-                            self.socket.send_string(json.dumps(dummy_message))
-                            response = json.loads(self.socket.recv_string())
-                            continue
-                        
-                        # Otherwise bid on the next task
-                        current_task = next_task
-                        response = self.submit_bid(current_task)
-                    else:
-                        # We didn't win, bid on next task
-                        next_task = response["content"]["next_task"]
-                        if next_task is None:
-                            # Send a final bid to get the no_more_tasks response
-                            dummy_message = {
-                                "sender": self.robot_id,
-                                "performative": Performative.BID.value,
-                                "content": {
-                                    "task_id": -1,  # Invalid task ID to trigger end
-                                    "bid_amount": 0
-                                }
-                            }
-                            self.socket.send_string(json.dumps(dummy_message))
-                            response = json.loads(self.socket.recv_string())
-                        else:
-                            current_task = next_task
-                            response = self.submit_bid(current_task)
-                
-                # Handle task_completed message
-                if response["performative"] == "task_completed":
-                    next_task = response["content"]["next_task"]
-                    if next_task is None:
-                        # Send a final bid to get the no_more_tasks response
-                        dummy_message = {
-                            "sender": self.robot_id,
-                            "performative": Performative.BID.value,
-                            "content": {
-                                "task_id": -1,  # Invalid task ID to trigger end
-                                "bid_amount": 0
-                            }
-                        }
-                        self.socket.send_string(json.dumps(dummy_message))
-                        response = json.loads(self.socket.recv_string())
-                    else:
-                        current_task = next_task
-                        response = self.submit_bid(current_task)
-                
-                time.sleep(0.1)
+                handler = self._handlers.get(response["performative"], self._h_unknown)
+                response = await handler(response)
+                await asyncio.sleep(0.1)
                 
             except Exception as e:
                 print(f"\nError: {e}")
-                time.sleep(1)
+                await asyncio.sleep(1)
 
 if __name__ == "__main__":
-    robot = RobotAgent()
-    robot.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--realtime", action="store_true",
+                        help="pace movement (2s/cell) and task execution (10s) for demos")
+    args = parser.parse_args()
+    if args.realtime:
+        robot = RobotAgent(step_delay=2.0, task_delay=10.0)
+    else:
+        robot = RobotAgent()
+    asyncio.run(robot.run())
\ No newline at end of file
@@ -1,20 +1,47 @@
+import argparse
+import queue
+import threading
+from collections import deque
 import zmq
-import json
+import msgpack
+import numpy as np
 import random
 import time
 import pygame
-from enum import Enum
+from typing import Final
 import math
+import os
+import sys
 
-class Performative(Enum):
-    ANNOUNCE_TASK = "announce_task"
-    BID = "bid"
-    AWARD_TASK = "award_task"
-    NEGOTIATE = "negotiate"
-    COMPLETE_TASK = "complete_task"
-    TRANSFER_CURRENCY = "transfer_currency"
-    STARTUP = "startup"
-    MOVEMENT = "movement"
+# Performatives travel as small ints so they pack as msgpack fixints.
+# R1.py and R2.py mirror these values.
+ANNOUNCE_TASK: Final = 1
+BID: Final = 2
+AWARD_TASK: Final = 3
+NEGOTIATE: Final = 4
+COMPLETE_TASK: Final = 5
+TRANSFER_CURRENCY: Final = 6
+STARTUP: Final = 7
+MOVEMENT: Final = 8
+START_BIDDING: Final = 9
+WAIT: Final = 10
+WAITING_FOR_BIDS: Final = 11
+WRONG_TASK: Final = 12
+TASK_COMPLETED: Final = 13
+NO_MORE_TASKS: Final = 14
+MOVEMENT_UPDATED: Final = 15
+ERROR: Final = 16
+MOVEMENT_BATCH: Final = 17
+
+# Same-host runs default to a Unix domain socket; Windows has no ipc:// transport
+DEFAULT_ENDPOINT = "tcp://127.0.0.1:5555" if sys.platform == "win32" else "ipc:///tmp/multirobot.sock"
+ENDPOINT = os.environ.get("MR_ENDPOINT", DEFAULT_ENDPOINT)
+
+def pack(message):
+    return msgpack.packb(message, use_bin_type=True)
+
+def unpack(buf):
+    return msgpack.unpackb(buf, raw=False)
 
 class Task:
     def __init__(self, task_id, description, base_cost, position):
@@ -35,15 +62,21 @@ class Task:
         }
 
 class CentralAgent:
-    def __init__(self):
+    def __init__(self, move_frame_delay=0):
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REP)
-        self.socket.bind("tcp://*:5555")
+        self.socket = self.context.socket(zmq.ROUTER)
+        # Keep per-robot queues short; each robot has at most one request in flight
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.SNDHWM, 16)
+        self.socket.setsockopt(zmq.RCVHWM, 16)
+        self.socket.bind(ENDPOINT)
         
         pygame.init()
         self.cell_size = 100
         self.grid_size = 10
         self.window_size = self.cell_size * self.grid_size
+        # Pixel centre of each grid column/row, looked up instead of recomputed per frame
+        self._cc = [i * self.cell_size + self.cell_size // 2 for i in range(self.grid_size)]
         self.screen = pygame.display.set_mode((self.window_size, self.window_size))
         pygame.display.set_caption("Task Allocation Grid")
         
@@ -52,6 +85,7 @@ class CentralAgent:
         self.RED = (255, 0, 0)
         self.BLUE = (0, 0, 255)
         self.GREEN = (0, 255, 0)
+        self.move_frame_delay = move_frame_delay  # ms between animated steps of a movement batch
         
         positions = self.generate_random_positions(5)
         
@@ -64,12 +98,31 @@ class CentralAgent:
         ]
         
         self.completed_tasks = []
-        self.robot_positions = {"R1": (0, 0), "R2": (9, 0)}
         self.robot_balances = {"R1": 10, "R2": 10}
         self.current_task_index = 0
-        self.bids = {}
+        # Bids live in a fixed-size array indexed by robot slot
+        self._robot_index = {"R1": 0, "R2": 1}
+        self._robot_index_inv = list(self._robot_index)
+        self._bids = np.full(len(self._robot_index), np.inf)
+        self._bid_received = np.zeros(len(self._robot_index), dtype=bool)
+        self._pending_bidders = []  # (identity, correlation_id) awaiting the award
+        # Positions as int16 struct-of-arrays: rows follow self.tasks and robot slots
+        self._task_pos = np.array([task.position for task in self.tasks], dtype=np.int16)
+        self._robot_pos = np.array([(0, 0), (9, 0)], dtype=np.int16)
         self.robots_ready = set()
         self.all_tasks_completed = False
+        
+        # Drawing resources that never change are built once
+        self._font = pygame.font.Font(None, 36)
+        self._task_surfs = {task.task_id: self._font.render(f"T{task.task_id}", True, self.BLACK)
+                            for task in self.tasks}
+        self._background = self.render_background()
+        self._header = []
+        
+        # pygame is only touched by the UI loop; network handlers queue draw commands
+        self._draw_cmds = queue.SimpleQueue()
+        self._pending_draws = deque()
+        self._next_draw_at = 0
 
     def generate_random_positions(self, num_positions):
         positions = []
@@ -79,54 +132,69 @@ class CentralAgent:
                 positions.append(pos)
         return positions
 
-    def draw_grid(self):
-        self.screen.fill(self.WHITE)
+    def render_background(self):
+        background = pygame.Surface((self.window_size, self.window_size))
+        background.fill(self.WHITE)
         
         # Draw grid lines
         for i in range(self.grid_size + 1):
-            pygame.draw.line(self.screen, self.BLACK, 
+            pygame.draw.line(background, self.BLACK, 
                            (i * self.cell_size, 0), 
                            (i * self.cell_size, self.window_size))
-            pygame.draw.line(self.screen, self.BLACK, 
+            pygame.draw.line(background, self.BLACK, 
                            (0, i * self.cell_size), 
                            (self.window_size, i * self.cell_size))
-        
-        # Draw tasks
-        font = pygame.font.Font(None, 36)
-        for task in self.tasks:
-            if task not in self.completed_tasks:
-                x, y = task.position
-                text = font.render(f"T{task.task_id}", True, self.BLACK)
-                text_rect = text.get_rect(center=(x * self.cell_size + self.cell_size/2,
-                                                y * self.cell_size + self.cell_size/2))
-                self.screen.blit(text, text_rect)
-        
-        # Draw completed tasks count
+        return background
+
+    def render_header(self):
+        # Completed count and balances only change when a task completes
+        self._header = []
         completed_text = f"Completed: {len(self.completed_tasks)}/{len(self.tasks)}"
-        text = font.render(completed_text, True, self.GREEN)
-        text_rect = text.get_rect(midtop=(self.window_size/2, 10))
-        self.screen.blit(text, text_rect)
+        text = self._font.render(completed_text, True, self.GREEN)
+        self._header.append((text, text.get_rect(midtop=(self.window_size/2, 10))))
         
-        # Draw robots and their balances
-        for robot_id, pos in self.robot_positions.items():
-            x, y = pos
+        for robot_id in self._robot_index_inv:
             color = self.RED if robot_id == "R1" else self.BLUE
-            pygame.draw.circle(self.screen, color,
-                             (x * self.cell_size + self.cell_size/2,
-                              y * self.cell_size + self.cell_size/2),
-                             self.cell_size/4)
-            
-            # Draw robot labels and balances
             balance_text = f"{robot_id}: {self.robot_balances[robot_id]:.1f}"
-            text = font.render(balance_text, True, color)
+            text = self._font.render(balance_text, True, color)
             if robot_id == "R1":
                 text_rect = text.get_rect(topleft=(10, 10))
             else:
                 text_rect = text.get_rect(topright=(self.window_size - 10, 10))
+            self._header.append((text, text_rect))
+
+    def compose(self):
+        self.screen.blit(self._background, (0, 0))
+        
+        # Draw tasks
+        for i, task in enumerate(self.tasks):
+            if task not in self.completed_tasks:
+                x, y = self._task_pos[i].tolist()
+                text = self._task_surfs[task.task_id]
+                text_rect = text.get_rect(center=(self._cc[x], self._cc[y]))
+                self.screen.blit(text, text_rect)
+        
+        # Draw completed tasks count and robot balances
+        for text, text_rect in self._header:
             self.screen.blit(text, text_rect)
         
+        # Draw robots
+        for i in range(len(self._robot_index_inv)):
+            x, y = self._robot_pos[i].tolist()
+            color = self.RED if self._robot_index_inv[i] == "R1" else self.BLUE
+            pygame.draw.circle(self.screen, color,
+                             (self._cc[x], self._cc[y]),
+                             self.cell_size/4)
+
+    def draw_grid(self):
+        self.render_header()
+        self.compose()
         pygame.display.flip()
 
+    def cell_rect(self, position):
+        x, y = position
+        return pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+
     def handle_startup(self, message):
         robot_id = message["sender"]
         self.robots_ready.add(robot_id)
@@ -135,30 +203,45 @@ class CentralAgent:
         if len(self.robots_ready) == 2:
             print("\nAll robots connected. Starting task allocation...")
             return {
-                "performative": "start_bidding",
+                "performative": START_BIDDING,
                 "content": {
                     "message": "All robots connected, start bidding",
-                    "first_task": self.announce_task()
+                    "tasks": [task.to_dict() for task in self.tasks],
+                    "first_task_id": self.announce_task()
                 }
             }
         return {
-            "performative": "wait",
+            "performative": WAIT,
             "content": {
                 "message": "Waiting for other robot"
             }
         }
 
     def update_robot_position(self, robot_id, new_position):
-        self.robot_positions[robot_id] = new_position
-        self.draw_grid()
+        slot = self._robot_index[robot_id]
+        old_position = self._robot_pos[slot].tolist()
+        self._robot_pos[slot] = new_position
+        
+        # Only the cells the robot left and entered need repainting
+        dirty = [self.cell_rect(old_position), self.cell_rect(new_position)]
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.compose()
+        self.screen.set_clip(None)
+        pygame.display.update(dirty)
+
+    def animate_path(self, robot_id, path):
+        for position in path:
+            self._draw_cmds.put(("move", (robot_id, position)))
 
     def announce_task(self):
+        # Robots receive the full task list at startup, so only the id is sent
         if self.current_task_index >= len(self.tasks):
             self.all_tasks_completed = True
             return None
-        return self.tasks[self.current_task_index].to_dict()
+        return self.tasks[self.current_task_index].task_id
 
-    def handle_bid(self, message):
+    def handle_bid(self, message, reply_to):
         robot_id = message["sender"]
         bid_amount = message["content"]["bid_amount"]
         task_id = message["content"]["task_id"]
@@ -167,7 +250,7 @@ class CentralAgent:
         if self.all_tasks_completed or self.current_task_index >= len(self.tasks):
             self.all_tasks_completed = True
             return {
-                "performative": "no_more_tasks",
+                "performative": NO_MORE_TASKS,
                 "content": {
                     "message": "All tasks completed",
                     "final_balance": self.robot_balances[robot_id]
@@ -177,7 +260,7 @@ class CentralAgent:
         # Handle invalid task_id (end of tasks indicator)
         if task_id == -1:
             return {
-                "performative": "no_more_tasks",
+                "performative": NO_MORE_TASKS,
                 "content": {
                     "message": "All tasks completed",
                     "final_balance": self.robot_balances[robot_id]
@@ -189,113 +272,195 @@ class CentralAgent:
         # If robot is bidding for wrong task, send current task info
         if task_id != current_task.task_id:
             return {
-                "performative": "wrong_task",
+                "performative": WRONG_TASK,
                 "content": {
-                    "correct_task": current_task.to_dict()
+                    "correct_task_id": current_task.task_id
                 }
             }
         
         print(f"\n{robot_id} bids {bid_amount:.1f} for task {task_id}")
-        self.bids[robot_id] = bid_amount
+        slot = self._robot_index[robot_id]
+        self._bids[slot] = bid_amount
+        self._bid_received[slot] = True
+        self._pending_bidders.append(reply_to)
         
         # If we have bids from both robots
-        if len(self.bids) == 2:
+        if self._bid_received.all():
             winner = self.determine_winner()
             print(f"\nTask {task_id} awarded to {winner}")
             
             # Clear bids and move to next task
-            self.bids = {}
+            self._bids.fill(np.inf)
+            self._bid_received.fill(False)
             self.current_task_index += 1
-            next_task = self.announce_task()
+            next_task_id = self.announce_task()
             
-            return {
-                "performative": Performative.AWARD_TASK.value,
+            award = {
+                "performative": AWARD_TASK,
                 "content": {
                     "winner": winner,
                     "task_id": task_id,
-                    "next_task": next_task
+                    "next_task_id": next_task_id
                 }
             }
+            for identity, correlation_id in self._pending_bidders:
+                self.reply(identity, correlation_id, award)
+            self._pending_bidders = []
         
-        return {
-            "performative": "waiting_for_bids",
-            "content": {
-                "current_task": current_task.to_dict()
-            }
-        }
+        # Bid replies are held until the last bid closes the round, then
+        # every bidder gets the award above at once
+        return None
 
     def determine_winner(self):
-        if self.bids["R1"] == self.bids["R2"]:
-            return random.choice(["R1", "R2"])
-        return min(self.bids, key=self.bids.get)
+        # Lowest bid wins; ties are broken at random
+        lowest = np.flatnonzero(self._bids == self._bids.min())
+        return self._robot_index_inv[int(random.choice(lowest))]
 
-    def run(self):
-        print("\nCentral Agent running...")
-        self.draw_grid()
+    def handle_message(self, message, reply_to):
+        if message["performative"] == STARTUP:
+            response = self.handle_startup(message)
+        elif message["performative"] == BID:
+            response = self.handle_bid(message, reply_to)
+        elif message["performative"] == COMPLETE_TASK:
+            robot_id = message["sender"]
+            task_id = message["content"]["task_id"]
+            
+            # The leg walked to the task arrives with the completion report
+            path = message["content"].get("path") or []
+            if not path and "final_position" in message["content"]:
+                path = [message["content"]["final_position"]]
+            self.animate_path(robot_id, path)
+            
+            # Add task to completed tasks
+            completed_task_index = task_id - 1
+            if 0 <= completed_task_index < len(self.tasks):
+                completed_task = self.tasks[completed_task_index]
+                if completed_task not in self.completed_tasks:
+                    self.completed_tasks.append(completed_task)
+            
+            # Give reward
+            reward = 5
+            self.robot_balances[robot_id] += reward
+            print(f"\n{robot_id} completed task {task_id}. Reward: {reward}")
+            
+            next_task_id = self.announce_task()
+            response = {
+                "performative": TASK_COMPLETED,
+                "content": {
+                    "reward": reward,
+                    "new_balance": self.robot_balances[robot_id],
+                    "next_task_id": next_task_id
+                }
+            }
+            
+            # Update display after task completion
+            self._draw_cmds.put(("redraw", ()))
+        elif message["performative"] == MOVEMENT:
+            # Movement reports are fire-and-forget notifications
+            self.animate_path(message["sender"], [message["content"]["position"]])
+            response = None
+        elif message["performative"] == MOVEMENT_BATCH:
+            # A whole movement leg arrives at once; animate it locally
+            self.animate_path(message["sender"], message["content"]["path"])
+            response = None
+        else:
+            response = {
+                "performative": ERROR,
+                "content": {"message": f"Unknown performative: {message['performative']}"}
+            }
         
-        while True:
+        return response
+
+    def reply(self, identity, correlation_id, response):
+        # Notifications carry an empty correlation id and never get a reply
+        if correlation_id and response is not None:
+            self.socket.send_multipart([identity, b"", correlation_id, pack(response)])
+
+    def handle_batch(self, frames):
+        # Frames: [robot identity, empty delimiter, correlation id, payload]
+        messages = []
+        for identity, _, correlation_id, payload in frames:
+            try:
+                messages.append((identity, correlation_id, unpack(payload)))
+            except Exception as e:
+                print(f"\nError: {e}")
+                self.reply(identity, correlation_id, {
+                    "performative": ERROR,
+                    "content": {"message": str(e)}
+                })
+        
+        # Only the newest movement report per robot in the batch is drawn
+        movement = (MOVEMENT, MOVEMENT_BATCH)
+        latest_move = {}
+        for i, (_, _, message) in enumerate(messages):
+            if message.get("performative") in movement:
+                latest_move[message.get("sender")] = i
+        
+        for i, (identity, correlation_id, message) in enumerate(messages):
             try:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        return
-                
-                message = json.loads(self.socket.recv_string())
-                
-                if message["performative"] == "startup":
-                    response = self.handle_startup(message)
-                elif message["performative"] == Performative.BID.value:
-                    response = self.handle_bid(message)
-                elif message["performative"] == Performative.COMPLETE_TASK.value:
-                    robot_id = message["sender"]
-                    task_id = message["content"]["task_id"]
-                    
-                    if "position" in message["content"]:
-                        self.update_robot_position(robot_id, message["content"]["position"])
-                    
-                    # Add task to completed tasks
-                    completed_task_index = task_id - 1
-                    if 0 <= completed_task_index < len(self.tasks):
-                        completed_task = self.tasks[completed_task_index]
-                        if completed_task not in self.completed_tasks:
-                            self.completed_tasks.append(completed_task)
-                    
-                    # Give reward
-                    reward = 5
-                    self.robot_balances[robot_id] += reward
-                    print(f"\n{robot_id} completed task {task_id}. Reward: {reward}")
-                    
-                    next_task = self.announce_task()
-                    response = {
-                        "performative": "task_completed",
-                        "content": {
-                            "reward": reward,
-                            "new_balance": self.robot_balances[robot_id],
-                            "next_task": next_task
-                        }
-                    }
-                    
-                    # Update display after task completion
-                    self.draw_grid()
-                elif message["performative"] == "movement":
-                    self.update_robot_position(message["sender"], message["content"]["position"])
-                    response = {"performative": "movement_updated", "content": None}
-                else:
-                    response = {
-                        "performative": "error",
-                        "content": {"message": f"Unknown performative: {message['performative']}"}
-                    }
-                
-                self.socket.send_string(json.dumps(response))
-                
+                if message.get("performative") in movement and latest_move[message.get("sender")] != i:
+                    continue
+                response = self.handle_message(message, (identity, correlation_id))
             except Exception as e:
                 print(f"\nError: {e}")
-                error_response = {
-                    "performative": "error",
+                response = {
+                    "performative": ERROR,
                     "content": {"message": str(e)}
                 }
-                self.socket.send_string(json.dumps(error_response))
+            self.reply(identity, correlation_id, response)
+
+    def _apply_draw_cmds(self):
+        while True:
+            try:
+                self._pending_draws.append(self._draw_cmds.get_nowait())
+            except queue.Empty:
+                break
+        
+        # Movement steps are paced by move_frame_delay without blocking anything
+        now = pygame.time.get_ticks()
+        while self._pending_draws and now >= self._next_draw_at:
+            op, args = self._pending_draws.popleft()
+            if op == "move":
+                self.update_robot_position(*args)
+                if self.move_frame_delay:
+                    self._next_draw_at = now + self.move_frame_delay
+            elif op == "redraw":
+                self.draw_grid()
+
+    def _ui_loop(self):
+        clock = pygame.time.Clock()
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    return
+            self._apply_draw_cmds()
+            clock.tick(60)
+
+    def _network_loop(self):
+        while True:
+            # Block for the next message, then drain whatever else is already queued
+            frames = [self.socket.recv_multipart()]
+            while True:
+                try:
+                    frames.append(self.socket.recv_multipart(zmq.NOBLOCK))
+                except zmq.Again:
+                    break
+            self.handle_batch(frames)
+
+    def run(self):
+        print("\nCentral Agent running...")
+        self.draw_grid()
+        
+        # pygame must stay on the thread that created the window, so the
+        # network loop is the one moved onto a background thread
+        threading.Thread(target=self._network_loop, daemon=True).start()
+        self._ui_loop()
 
 if __name__ == "__main__":
-    server = CentralAgent()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--realtime", action="store_true",
+                        help="animate robot movement step by step")
+    args = parser.parse_args()
+    server = CentralAgent(move_frame_delay=200 if args.realtime else 0)
     server.run()
\ No newline at end of file
@@ -9,15 +9,23 @@ $ python server.py --tasks tasks.json --robots R1:6001 R2:6002
 
 import argparse
 import json
+import math
+import selectors
 import socket
+import struct
+import sys
 import threading
-import time
 import uuid
 from collections import defaultdict
 from pathlib import Path
 
+import msgpack
+
 HOST = "127.0.0.1"  # local only for coursework
-BUFFER = 4096
+BUFFER = 65536       # per-robot receive buffer, grown for larger frames
+HEADER = struct.Struct(">I")  # 4-byte big-endian frame length
+SO_BUSY_POLL = getattr(socket, "SO_BUSY_POLL", 46)  # Linux value; not exported by Python
+HAVE_SENDMSG = hasattr(socket.socket, "sendmsg")    # missing on Windows
 
 class CentralAgent:
     def __init__(self, tasks, robot_map, port=5000):
@@ -29,25 +37,131 @@ class CentralAgent:
         self.server.listen(len(robot_map))
 
         self.clients = {}                  # {robot_id: conn}
-        self.balances = defaultdict(lambda: 100.0)
-        self.task_queue = tasks.copy()
-        self.lock = threading.Lock()
+        self._client_items = ()            # frozen (rid, conn) pairs once all joined
+        self.sel = selectors.DefaultSelector()
+        self._rxbufs = {}                  # {robot_id: bytearray} receive buffer
+        self._rxpos = {}                   # {robot_id: bytes of it in use}
+        self._outbuf = defaultdict(list)   # {conn: [frame, …]} until _flush
+        self.balances = {rid: 100.0 for rid in robot_map}
+        # per-task locks for bid state; balances have their own lock
+        self._task_locks = {t["task_id"]: threading.Lock() for t in tasks}
+        self._bal_lock = threading.Lock()
+        self._awarded = set()              # task_ids already given to a robot
+        # award/reject bodies only differ per robot until the task_id value
+        packer = msgpack.Packer(use_bin_type=True)
+        self._acc_prefix = {rid: self._prefix(packer, "accept-proposal", rid, 2)
+                            for rid in robot_map}
+        self._rej_prefix = {rid: self._prefix(packer, "reject-proposal", rid, 1)
+                            for rid in robot_map}
+        self._price_key = packer.pack("price")
 
     # ------------------------------------------------------------
     # Networking helpers
     # ------------------------------------------------------------
+    def _tune(self, conn):
+        # small control messages: send immediately, busy-poll briefly on read
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if sys.platform.startswith("linux"):
+            try:
+                conn.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, 50)
+            except OSError:
+                pass  # may need CAP_NET_ADMIN
+
+    def _prefix(self, packer, performative, rid, n_content):
+        """msgpack bytes of a central → rid message up to its task_id value."""
+        return (packer.pack_map_header(4)
+                + packer.pack("performative") + packer.pack(performative)
+                + packer.pack("sender") + packer.pack("central")
+                + packer.pack("receiver") + packer.pack(rid)
+                + packer.pack("content") + packer.pack_map_header(n_content)
+                + packer.pack("task_id"))
+
+    def _frame(self, msg):
+        body = msgpack.packb(msg, use_bin_type=True)
+        return HEADER.pack(len(body)) + body
+
     def _send(self, conn, msg):
-        encoded = (json.dumps(msg) + "\n").encode()
-        conn.sendall(encoded)
+        # queued; everything for one socket leaves in a single sendmsg
+        self._outbuf[conn].append(self._frame(msg))
+
+    def _flush(self):
+        for conn, frames in self._outbuf.items():
+            if not frames:
+                continue
+            try:
+                if HAVE_SENDMSG:
+                    sent = conn.sendmsg(frames)
+                else:
+                    sent = conn.send(b"".join(frames))
+            except BlockingIOError:
+                sent = 0
+            if sent == sum(len(f) for f in frames):
+                frames.clear()
+            else:
+                # socket buffer is full: keep the rest until it is writable
+                frames[:] = [b"".join(frames)[sent:]]
+            self._want_write(conn, bool(frames))
+
+    def _want_write(self, conn, pending):
+        key = self.sel.get_key(conn)
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        if key.events != events:
+            self.sel.modify(conn, events, key.data)
+
+    def _recv_exact(self, conn, n):
+        data = bytearray(n)
+        view = memoryview(data)
+        got = 0
+        while got < n:
+            k = conn.recv_into(view[got:], n - got)
+            if not k:
+                raise ConnectionError("client closed socket")
+            got += k
+        return data
 
     def _recv(self, conn):
-        data = b""
-        while not data.endswith(b"\n"):
-            chunk = conn.recv(BUFFER)
-            if not chunk:
-                raise ConnectionError("client closed socket")
-            data += chunk
-        return json.loads(data.decode())
+        (n,) = HEADER.unpack(self._recv_exact(conn, HEADER.size))
+        return msgpack.unpackb(self._recv_exact(conn, n), raw=False)
+
+    def _try_recv(self, conn, view):
+        """Single non-blocking recv_into; None when nothing is left to read."""
+        try:
+            k = conn.recv_into(view)
+        except BlockingIOError:
+            return None
+        if not k:
+            raise ConnectionError("client closed socket")
+        return k
+
+    def _read_ready(self, conn, rid):
+        """Drain a socket the selector reported readable and return every
+        complete frame; a trailing partial frame moves to the front."""
+        buf = self._rxbufs[rid]
+        view = memoryview(buf)
+        pos = self._rxpos[rid]
+        while True:
+            if pos == len(buf):
+                # pending frame is larger than the buffer
+                grown = bytearray(2 * len(buf))
+                grown[:pos] = buf
+                self._rxbufs[rid] = buf = grown
+                view = memoryview(buf)
+            k = self._try_recv(conn, view[pos:])
+            if k is None:
+                break
+            pos += k
+        msgs = []
+        start = 0
+        while pos - start >= HEADER.size:
+            (n,) = HEADER.unpack_from(buf, start)
+            end = start + HEADER.size + n
+            if end > pos:
+                break
+            msgs.append(msgpack.unpackb(view[start + HEADER.size:end], raw=False))
+            start = end
+        view[:pos - start] = view[start:pos]
+        self._rxpos[rid] = pos - start
+        return msgs
 
     # ------------------------------------------------------------
     # Auction workflow
@@ -59,55 +173,93 @@ class CentralAgent:
             "sender": "central",
             "receiver": list(self.robot_map.keys()),
             "conversation_id": str(uuid.uuid4()),
-            "content": {"tasks": self.task_queue},
+            "content": {"tasks": self.tasks},
         }
-        for conn in self.clients.values():
-            self._send(conn, cfp_msg)
+        # identical for every robot, so encode once
+        frame = self._frame(cfp_msg)
+        for _, conn in self._client_items:
+            self._outbuf[conn].append(frame)
 
     def run(self):
         print(f"CentralAgent listening on {HOST}:{self.port} …")
         # accept all robot connections first
         for _ in self.robot_map:
             conn, _ = self.server.accept()
+            self._tune(conn)
             hello = self._recv(conn)
+            conn.setblocking(False)  # from here on only touched via the selector
             rid = hello["sender"]
             self.clients[rid] = conn
+            self._rxbufs[rid] = bytearray(BUFFER)
+            self._rxpos[rid] = 0
+            self.sel.register(conn, selectors.EVENT_READ, data=rid)
             print(f"Robot {rid} connected")
+        # membership is fixed for the rest of the session
+        self._client_items = tuple(self.clients.items())
         # announce tasks once all are connected
         self.broadcast_cfp()
+        self._flush()
         # main event loop
-        active_bids = defaultdict(dict)     # {task_id: {rid: bid}}
+        # {task_id: {"bids": {rid: bid}, "min": lowest, "winners": [rid, …]}}
+        active_bids = {t["task_id"]: {"bids": {}, "min": math.inf, "winners": []}
+                       for t in self.tasks}
         finished = 0
         while finished < len(self.tasks):
-            for rid, conn in list(self.clients.items()):
-                try:
-                    if conn.recv(1, socket.MSG_PEEK):  # non‑blocking peek
-                        msg = self._recv(conn)
-                        pf = msg.get("performative")
-                        if pf == "propose":
-                            self.handle_propose(msg, active_bids)
-                        elif pf == "inform-done":
-                            finished += 1
-                            task_id = msg["content"]["task_id"]
-                            self._task_complete(rid, task_id)
-                        elif pf == "negotiation-result":
-                            self._handle_negotiation(msg)
-                except BlockingIOError:
-                    continue
-            time.sleep(0.05)
+            # block until a robot socket is readable (or writable while
+            # output is pending) instead of polling
+            for key, mask in self.sel.select(timeout=None):
+                if not mask & selectors.EVENT_READ:
+                    continue  # writable only; _flush below sends the rest
+                rid = key.data
+                for msg in self._read_ready(key.fileobj, rid):
+                    pf = msg.get("performative")
+                    if pf == "propose-batch":
+                        self.handle_propose_batch(msg, active_bids)
+                    elif pf == "propose":
+                        self.handle_propose(msg, active_bids)
+                    elif pf == "inform-done":
+                        finished += 1
+                        task_id = msg["content"]["task_id"]
+                        self._task_complete(rid, task_id)
+                    elif pf == "negotiation-result":
+                        self._handle_negotiation(msg)
+            self._flush()
         print("All tasks complete. Ledger:")
         for rid, bal in self.balances.items():
             print(f"  {rid}: {bal}")
 
     def handle_propose(self, msg, active_bids):
+        content = msg["content"]
+        self._record_bid(msg["sender"], content["task_id"], content["bid"], active_bids)
+
+    def handle_propose_batch(self, msg, active_bids):
         rid = msg["sender"]
-        task_id = msg["content"]["task_id"]
-        bid = msg["content"]["bid"]
-        active_bids[task_id][rid] = bid
-        # once we have all bids for this task, evaluate
-        if len(active_bids[task_id]) == len(self.robot_map):
-            bids = active_bids.pop(task_id)
-            winners = self._detect_tie(bids)
+        for entry in msg["content"]["bids"]:
+            self._record_bid(rid, entry["task_id"], entry["bid"], active_bids)
+
+    def _record_bid(self, rid, task_id, bid, active_bids):
+        lock = self._task_locks.get(task_id)
+        if lock is None:
+            return  # not one of our tasks
+        with lock:
+            entry = active_bids.get(task_id)
+            if entry is None:
+                return  # bidding for this task already closed
+            if rid in entry["bids"]:
+                return  # first bid stands; min/winners assume one bid per robot
+            entry["bids"][rid] = bid
+            # track the lowest bid and its tie set as bids arrive
+            if bid < entry["min"]:
+                entry["min"] = bid
+                entry["winners"] = [rid]
+            elif bid == entry["min"]:
+                entry["winners"].append(rid)
+            # once we have all bids for this task, evaluate
+            complete = len(entry["bids"]) == len(self.robot_map)
+            if complete:
+                del active_bids[task_id]
+        if complete:
+            bids, winners = entry["bids"], entry["winners"]
             if len(winners) == 1:
                 self._award_task(task_id, winners[0], bids[winners[0]])
             else:
@@ -116,34 +268,27 @@ class CentralAgent:
     # ------------------------------------------------------------
     # Helper functions
     # ------------------------------------------------------------
-    def _detect_tie(self, bids):
-        low = min(bids.values())
-        return [r for r, b in bids.items() if b == low]
-
     def _award_task(self, task_id, winner, price):
-        self.balances[winner] -= price              # tax
-        msg = {
-            "performative": "accept-proposal",
-            "sender": "central",
-            "receiver": winner,
-            "content": {"task_id": task_id, "price": price},
-        }
-        self._send(self.clients[winner], msg)
+        self._awarded.add(task_id)
+        with self._bal_lock:
+            self.balances[winner] -= price          # tax
+        tid = msgpack.packb(task_id, use_bin_type=True)
+        body = self._acc_prefix[winner] + tid + self._price_key + msgpack.packb(price)
+        self._outbuf[self.clients[winner]].append(HEADER.pack(len(body)) + body)
         # losers get rejection
-        for rid, conn in self.clients.items():
+        for rid, conn in self._client_items:
             if rid != winner:
-                rej = {
-                    "performative": "reject-proposal",
-                    "sender": "central",
-                    "receiver": rid,
-                    "content": {"task_id": task_id},
-                }
-                self._send(conn, rej)
+                body = self._rej_prefix[rid] + tid
+                self._outbuf[conn].append(HEADER.pack(len(body)) + body)
 
     def _trigger_negotiation(self, task_id, winners, bids):
-        """Tell tied robots to negotiate directly."""
-        for rid in winners:
-            peer = [r for r in winners if r != rid][0]
+        """Tell tied robots to negotiate directly.
+
+        Negotiation is bilateral, so only the two tied robots with the
+        lowest ids take part; any others in the tie get a rejection when
+        the negotiated award goes out."""
+        a, b = sorted(winners)[:2]
+        for rid, peer in ((a, b), (b, a)):
             msg = {
                 "performative": "inform-tie",
                 "sender": "central",
@@ -161,16 +306,20 @@ class CentralAgent:
         task_id = msg["content"]["task_id"]
         winner = msg["content"]["winner"]
         price = msg["content"]["price"]
+        if task_id in self._awarded:
+            return  # late or duplicate result
         self._award_task(task_id, winner, price)
 
     def _task_complete(self, rid, task_id):
         reward = 5.0   # fixed reward for demo
-        self.balances[rid] += reward
+        with self._bal_lock:
+            self.balances[rid] += reward
+            balance = self.balances[rid]
         ack = {
             "performative": "inform-reward",
             "sender": "central",
             "receiver": rid,
-            "content": {"task_id": task_id, "reward": reward, "balance": self.balances[rid]},
+            "content": {"task_id": task_id, "reward": reward, "balance": balance},
         }
         self._send(self.clients[rid], ack)
 
@@ -184,41 +333,61 @@ $ python robot_agent.py --id R2 --start 9 9 --listen 6002
 """
 
 import argparse
-import json
 import math
-import random
 import socket
+import struct
+import sys
 import threading
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import msgpack
+import numpy as np
+
 HOST = "127.0.0.1"
-BUFFER = 4096
+BUFFER = 65536       # per-socket receive buffer, grown for larger frames
+HEADER = struct.Struct(">I")  # 4-byte big-endian frame length
 DELTA = 0.9          # discount factor per negotiation round
 MAX_ROUNDS = 3
 
+# negotiation rounds on peer links are raw structs, not msgpack frames
+TAG_OFFER = 1
+TAG_AGREE = 2
+OFFER = struct.Struct(">Bf")     # tag, price
+AGREE = struct.Struct(">B16s")   # tag, winner id (NUL padded)
+PEER_TIMEOUT = 5.0   # seconds a negotiation may wait on its peer link
+
 class RobotAgent:
     def __init__(self, robot_id, start_x, start_y, central_port, listen_port):
+        # AGREE carries the winner id in a fixed 16-byte field
+        if len(robot_id.encode()) > AGREE.size - 1:
+            raise ValueError(f"robot id {robot_id!r} is longer than {AGREE.size - 1} bytes")
         self.rid = robot_id
         self.pos = (start_x, start_y)
         self.central_port = central_port
         self.listen_port = listen_port
         self.balance = 100.0
+        self._rxbufs = {}    # {socket: bytearray} reused by _recv
 
         # central connection (REQ‑like)
         self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.conn.connect((HOST, central_port))
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._conn_lock = threading.Lock()  # pool threads share self.conn
         hello = {"performative": "hello", "sender": self.rid}
-        self._send(self.conn, hello)
+        self._send_central(hello)
 
         # listener for peer negotiation
-        self.peer_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.peer_server.bind((HOST, listen_port))
-        self.peer_server.listen(1)
+        self._listen_peers(listen_port)
 
         # state
-        self.tasks = []
+        self._task_ids = []                          # from the last cfp …
+        self._task_xy = np.empty((0, 2), np.int32)   # … with matching (x, y) rows
+        self._rng = np.random.default_rng()
         self.current_task = None
+        self.pool = ThreadPoolExecutor(max_workers=4)  # bidding, negotiation, execution
         self.poll_thread = threading.Thread(target=self._poll_central, daemon=True)
         self.poll_thread.start()
 
@@ -226,16 +395,33 @@ class RobotAgent:
     # Networking helpers
     # ------------------------------------------------------------------
     def _send(self, conn, msg):
-        conn.sendall((json.dumps(msg) + "\n").encode())
+        body = msgpack.packb(msg, use_bin_type=True)
+        conn.sendall(HEADER.pack(len(body)) + body)
+
+    def _send_central(self, msg):
+        # sendall may take several send() calls; keep frames from interleaving
+        with self._conn_lock:
+            self._send(self.conn, msg)
+
+    def _recv_into(self, conn, view, n):
+        got = 0
+        while got < n:
+            k = conn.recv_into(view[got:n], n - got)
+            if not k:
+                raise ConnectionError("socket closed")
+            got += k
 
     def _recv(self, conn):
-        data = b""
-        while not data.endswith(b"\n"):
-            chunk = conn.recv(BUFFER)
-            if not chunk:
-                raise ConnectionError("socket closed")
-            data += chunk
-        return json.loads(data.decode())
+        buf = self._rxbufs.get(conn)
+        if buf is None:
+            buf = self._rxbufs[conn] = bytearray(BUFFER)
+        self._recv_into(conn, memoryview(buf), HEADER.size)
+        (n,) = HEADER.unpack_from(buf)
+        if n > len(buf):
+            buf = self._rxbufs[conn] = bytearray(n)
+        view = memoryview(buf)
+        self._recv_into(conn, view, n)
+        return msgpack.unpackb(view[:n], raw=False)
 
     # ------------------------------------------------------------------
     # Main FSM
@@ -245,37 +431,48 @@ class RobotAgent:
             msg = self._recv(self.conn)
             pf = msg["performative"]
             if pf == "cfp":
-                self.tasks = msg["content"]["tasks"]
-                threading.Thread(target=self._bidding_loop, daemon=True).start()
+                tasks = msg["content"]["tasks"]
+                self._task_ids = [t["task_id"] for t in tasks]
+                self._task_xy = np.array([(t["x"], t["y"]) for t in tasks],
+                                         dtype=np.int32).reshape(-1, 2)
+                self._submit(self._bidding_loop)
             elif pf == "accept-proposal":
-                self._execute_task(msg["content"]["task_id"])
+                self._submit(self._execute_task, msg["content"]["task_id"])
             elif pf == "reject-proposal":
                 pass  # just ignore
             elif pf == "inform-tie":
-                threading.Thread(target=self._negotiate, args=(msg,), daemon=True).start()
+                self._submit(self._negotiate, msg)
             elif pf == "inform-reward":
                 self.balance = msg["content"]["balance"]
                 print(f"{self.rid} finished task {msg['content']['task_id']} — new balance {self.balance}")
 
+    def _submit(self, fn, *args):
+        # futures keep exceptions to themselves; report them as a thread would
+        self.pool.submit(fn, *args).add_done_callback(self._report_failure)
+
+    def _report_failure(self, fut):
+        exc = fut.exception()
+        if exc is not None:
+            print(f"{self.rid}: background task failed", file=sys.stderr)
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+
     def _bidding_loop(self):
-        for task in self.tasks:
-            bid = self._compute_bid(task)
-            proposal = {
-                "performative": "propose",
-                "sender": self.rid,
-                "receiver": "central",
-                "content": {"task_id": task["task_id"], "bid": bid},
-            }
-            self._send(self.conn, proposal)
-            # wait until accept/reject/tie comes back in polling thread
-            time.sleep(0.2)
+        # every bid goes out in one message; verdicts arrive in the polling thread
+        bids = self._compute_bid_batch()
+        proposal = {
+            "performative": "propose-batch",
+            "sender": self.rid,
+            "receiver": "central",
+            "content": {"bids": [{"task_id": task_id, "bid": bid}
+                                 for task_id, bid in zip(self._task_ids, bids)]},
+        }
+        self._send_central(proposal)
 
-    def _compute_bid(self, task):
-        tx, ty = task["x"], task["y"]
-        dist = abs(tx - self.pos[0]) + abs(ty - self.pos[1])
-        base_cost = dist * 0.1 + 0.3
-        jitter = random.uniform(0, 0.05)
-        return round(base_cost + jitter, 2)
+    def _compute_bid_batch(self):
+        """Bids for every task from the last cfp, as a list of floats."""
+        dists = np.abs(self._task_xy - np.array(self.pos, dtype=np.int32)).sum(axis=1)
+        jitter = self._rng.uniform(0, 0.05, size=len(dists))
+        return np.round(dists * 0.1 + 0.3 + jitter, 2).tolist()
 
     # ------------------------------------------------------------------
     # Task execution
@@ -289,11 +486,84 @@ class RobotAgent:
             "receiver": "central",
             "content": {"task_id": task_id},
         }
-        self._send(self.conn, done)
+        self._send_central(done)
 
     # ------------------------------------------------------------------
     # Negotiation
     # ------------------------------------------------------------------
+    def _listen_peers(self, listen_port):
+        """Open the peer listener. accept() belongs to one acceptor thread,
+        so concurrent negotiations never race for each other's links."""
+        self.peer_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.peer_server.bind((HOST, listen_port))
+        self.peer_server.listen(1)
+        self._peers = {}       # {peer_id: socket} kept open across negotiations
+        self._peer_locks = {}  # {peer_id: Lock} one negotiation per link at a time
+        self._peers_changed = threading.Condition()  # guards _peers
+        threading.Thread(target=self._accept_peers, daemon=True).start()
+
+    def _accept_peers(self):
+        while True:
+            try:
+                sock, _ = self.peer_server.accept()
+            except OSError:
+                return  # listener closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(PEER_TIMEOUT)
+            try:
+                peer_id = self._recv(sock)["hello"]
+            except (OSError, ValueError, KeyError):
+                sock.close()
+                continue
+            with self._peers_changed:
+                # a peer only redials after its old link failed
+                old = self._peers.pop(peer_id, None)
+                self._peers[peer_id] = sock
+                self._peers_changed.notify_all()
+            if old is not None:
+                self._rxbufs.pop(old, None)
+                old.close()
+
+    def _peer_link(self, peer_id, peer_port, initiator):
+        """Return the open socket to peer_id, creating it on first use.
+        The initiator dials and says hello; the responder waits for the
+        acceptor thread to file the peer's link."""
+        with self._peers_changed:
+            if not initiator and not self._peers_changed.wait_for(
+                    lambda: peer_id in self._peers, timeout=PEER_TIMEOUT):
+                raise TimeoutError(f"{peer_id} never connected")
+            sock = self._peers.get(peer_id)
+        if sock is None:
+            sock = socket.create_connection((HOST, peer_port), timeout=PEER_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._send(sock, {"hello": self.rid})
+            with self._peers_changed:
+                self._peers[peer_id] = sock
+        return sock
+
+    def _drop_peer(self, peer_id, sock):
+        with self._peers_changed:
+            # the peer may already have redialled; keep its new link
+            if self._peers.get(peer_id) is sock:
+                del self._peers[peer_id]
+        self._rxbufs.pop(sock, None)
+        sock.close()
+
+    def _recv_offer(self, sock):
+        """Next round from a peer: (TAG_OFFER, price) or (TAG_AGREE, winner)."""
+        buf = self._rxbufs.get(sock)
+        if buf is None:
+            buf = self._rxbufs[sock] = bytearray(BUFFER)
+        view = memoryview(buf)
+        self._recv_into(sock, view, 1)
+        tag = buf[0]
+        if tag == TAG_OFFER:
+            self._recv_into(sock, view[1:], OFFER.size - 1)
+            # prices are whole cents; drop the float32 rounding error
+            return tag, round(OFFER.unpack_from(buf)[1], 2)
+        self._recv_into(sock, view[1:], AGREE.size - 1)
+        return tag, AGREE.unpack_from(buf)[1].rstrip(b"\0").decode()
+
     def _negotiate(self, tie_msg):
         task_id = tie_msg["content"]["task_id"]
         peer_id = tie_msg["content"]["peer_id"]
@@ -302,27 +572,30 @@ class RobotAgent:
 
         # decide initiator: lexicographic larger name starts
         initiator = self.rid > peer_id
-        if initiator:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((HOST, peer_port))
-        else:
-            sock, _ = self.peer_server.accept()
-
-        for rnd in range(MAX_ROUNDS):
-            if initiator or rnd > 0:  # initiator sends first
-                offer = round(offer * DELTA, 2)
-                msg = json.dumps({"offer": offer}) + "\n"
-                sock.sendall(msg.encode())
-            reply = self._recv(sock)
-            if "agree" in reply:
-                winner = reply["agree"]
-                break
-            offer = reply["offer"]  # counter from peer
-            if rnd == MAX_ROUNDS - 1:
-                # timeout — decide randomly
-                winner = random.choice([self.rid, peer_id])
+        with self._peer_locks.setdefault(peer_id, threading.Lock()):
+            sock = self._peer_link(peer_id, peer_port, initiator)
+            try:
+                for rnd in range(MAX_ROUNDS):
+                    if initiator or rnd > 0:  # initiator sends first
+                        offer = round(offer * DELTA, 2)
+                        sock.sendall(OFFER.pack(TAG_OFFER, offer))
+                    tag, value = self._recv_offer(sock)
+                    if tag == TAG_AGREE:
+                        winner = value
+                        break
+                    offer = value  # counter from peer
+                    if rnd == MAX_ROUNDS - 1:
+                        # out of rounds: the responder holds the last offer, so it
+                        # decides and tells the initiator, whose final read gets
+                        # this AGREE instead of blocking for an offer never sent
+                        winner = max(self.rid, peer_id)
+                        sock.sendall(AGREE.pack(TAG_AGREE, winner.encode()))
+            except OSError:
+                # a half-finished exchange leaves the link out of step; the
+                # next tie with this peer reconnects instead of reusing it
+                self._drop_peer(peer_id, sock)
+                raise
 
-        sock.close()
         # tell central who won (only winner notifies)
         if winner == self.rid:
             result = {
@@ -331,7 +604,7 @@ class RobotAgent:
                 "receiver": "central",
                 "content": {"task_id": task_id, "winner": self.rid, "price": offer},
             }
-            self._send(self.conn, result)
+            self._send_central(result)
 
 # ------------------------------
 # R1.py and R2.py thin wrappers
@@ -0,0 +1,81 @@
+import selectors
+import socket
+import threading
+import unittest
+
+from test_negotiation import load_agents
+
+
+class RecordBidTest(unittest.TestCase):
+    def setUp(self):
+        ns = load_agents()
+        tasks = [{"task_id": 1, "x": 0, "y": 0}]
+        self.agent = ns["CentralAgent"](tasks, {"R1": 6001, "R2": 6002}, port=0)
+        self.addCleanup(self.agent.server.close)
+        self.active_bids = {1: {"bids": {}, "min": float("inf"), "winners": []}}
+        self.calls = []
+        self.agent._award_task = lambda *args: self.calls.append(("award",) + args)
+        self.agent._trigger_negotiation = lambda *args: self.calls.append(("tie",) + args)
+
+    def bid(self, rid, bid, task_id=1):
+        self.agent._record_bid(rid, task_id, bid, self.active_bids)
+
+    def test_repeated_equal_bid_is_not_a_tie(self):
+        self.bid("R1", 0.5)
+        self.bid("R1", 0.5)
+        self.bid("R2", 0.7)
+        self.assertEqual(self.calls, [("award", 1, "R1", 0.5)])
+
+    def test_revised_bid_is_ignored(self):
+        self.bid("R1", 0.5)
+        self.bid("R1", 0.9)
+        self.bid("R2", 0.7)
+        self.assertEqual(self.calls, [("award", 1, "R1", 0.5)])
+
+    def test_equal_bids_from_two_robots_tie(self):
+        self.bid("R1", 0.5)
+        self.bid("R2", 0.5)
+        self.assertEqual(self.calls[0][:3], ("tie", 1, ["R1", "R2"]))
+
+    def test_unknown_task_is_ignored(self):
+        self.bid("R1", 0.5, task_id=99)
+        self.assertEqual(self.calls, [])
+        self.assertNotIn(99, self.active_bids)
+
+
+class FlushTest(unittest.TestCase):
+    def test_backpressure_keeps_rest_queued(self):
+        ns = load_agents()
+        agent = ns["CentralAgent"]([], {"R1": 6001}, port=0)
+        self.addCleanup(agent.server.close)
+        conn, peer = socket.socketpair()
+        self.addCleanup(conn.close)
+        self.addCleanup(peer.close)
+        conn.setblocking(False)
+        agent.sel.register(conn, selectors.EVENT_READ, data="R1")
+        frame = agent._frame({"blob": b"x" * (4 << 20)})
+        agent._outbuf[conn].append(frame)
+
+        agent._flush()
+        # far more than a socket buffer holds: the rest waits for EVENT_WRITE
+        self.assertTrue(agent._outbuf[conn])
+        self.assertTrue(agent.sel.get_key(conn).events & selectors.EVENT_WRITE)
+
+        received = bytearray()
+
+        def read_all():
+            while len(received) < len(frame):
+                received.extend(peer.recv(1 << 16))
+
+        reader = threading.Thread(target=read_all, daemon=True)
+        reader.start()
+        while agent._outbuf[conn]:
+            agent.sel.select(timeout=1.0)
+            agent._flush()
+        reader.join(timeout=5.0)
+        self.assertEqual(bytes(received), frame)
+        self.assertEqual(agent.sel.get_key(conn).events, selectors.EVENT_READ)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import contextlib
+import io
+import pathlib
+import select
+import socket
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import msgpack
+
+SERVER2 = pathlib.Path(__file__).resolve().parent.parent / "server2.py"
+
+
+def load_agents():
+    # server2.py's __main__ glue is incomplete, so only the agent code above it is loaded
+    source = SERVER2.read_text(encoding="utf-8")
+    source = source[:source.index("# __main__ glue")]
+    ns = {"__name__": "server2"}
+    exec(compile(source, str(SERVER2), "exec"), ns)
+    return ns
+
+
+def make_robot(ns, rid):
+    """RobotAgent wired to a fake central socket, without the startup handshake."""
+    robot = ns["RobotAgent"].__new__(ns["RobotAgent"])
+    robot.rid = rid
+    robot._rxbufs = {}
+    robot._listen_peers(0)
+    robot.conn, central = socket.socketpair()
+    robot._conn_lock = threading.Lock()
+    return robot, central
+
+
+def recv_exact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("socket closed")
+        data += chunk
+    return data
+
+
+def tie_msg(peer, task_id, price):
+    return {"content": {"task_id": task_id,
+                        "peer_id": peer.rid,
+                        "peer_port": peer.peer_server.getsockname()[1],
+                        "start_price": price}}
+
+
+def run_negotiations(test, sides, price):
+    """Run (robot, peer, task_id) negotiations concurrently; all must finish."""
+    threads = [threading.Thread(target=robot._negotiate,
+                                args=(tie_msg(peer, task_id, price),),
+                                daemon=True)
+               for robot, peer, task_id in sides]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10.0)
+        test.assertFalse(t.is_alive(), "negotiation did not finish")
+
+
+def read_result(ns, central):
+    header = ns["HEADER"]
+    (n,) = header.unpack(recv_exact(central, header.size))
+    return msgpack.unpackb(recv_exact(central, n), raw=False)
+
+
+def close_robot(robot, central):
+    for sock in (robot.peer_server, robot.conn, central, *robot._peers.values()):
+        sock.close()
+
+
+class TieNegotiationTest(unittest.TestCase):
+    def setUp(self):
+        self.ns = load_agents()
+        self.r1, self.central1 = make_robot(self.ns, "R1")
+        self.r2, self.central2 = make_robot(self.ns, "R2")
+        for sock in (self.central1, self.central2):
+            sock.settimeout(5.0)
+
+    def tearDown(self):
+        close_robot(self.r1, self.central1)
+        close_robot(self.r2, self.central2)
+
+    def tie_msg(self, peer, task_id, price):
+        return tie_msg(peer, task_id, price)
+
+    def negotiate(self, task_id, price):
+        run_negotiations(self, [(self.r1, self.r2, task_id), (self.r2, self.r1, task_id)], price)
+
+    def read_result(self, central):
+        return read_result(self.ns, central)
+
+    def test_tie_reports_negotiation_result(self):
+        self.negotiate(4, 0.72)
+        result = self.read_result(self.central2)
+        self.assertEqual(result["performative"], "negotiation-result")
+        self.assertEqual(result["content"]["task_id"], 4)
+        self.assertEqual(result["content"]["winner"], "R2")
+        self.assertLess(result["content"]["price"], 0.72)
+        # only the winner reports
+        self.assertEqual(select.select([self.central1], [], [], 0.1)[0], [])
+
+    def test_link_is_reused_across_negotiations(self):
+        for task_id in (1, 2):
+            self.negotiate(task_id, 0.5)
+            self.assertEqual(self.read_result(self.central2)["content"]["task_id"], task_id)
+        # both rounds ran over the one cached link
+        self.assertEqual(list(self.r1._peers), ["R2"])
+        self.assertEqual(list(self.r2._peers), ["R1"])
+
+    def test_broken_link_is_dropped(self):
+        self.negotiate(1, 0.5)
+        self.read_result(self.central2)
+        self.r1._peers["R2"].close()
+        with self.assertRaises(OSError):
+            self.r2._negotiate(self.tie_msg(self.r1, 2, 0.5))
+        self.assertNotIn("R1", self.r2._peers)
+
+
+class RobotIdTest(unittest.TestCase):
+    def setUp(self):
+        self.ns = load_agents()
+
+    def test_id_too_long_for_agree_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.ns["RobotAgent"]("R" * 17, 0, 0, 5000, 6001)
+
+    def test_longest_id_survives_agree(self):
+        robot = self.ns["RobotAgent"].__new__(self.ns["RobotAgent"])
+        robot._rxbufs = {}
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        rid = "R" * 16
+        a.sendall(self.ns["AGREE"].pack(self.ns["TAG_AGREE"], rid.encode()))
+        self.assertEqual(robot._recv_offer(b), (self.ns["TAG_AGREE"], rid))
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def test_failed_task_is_reported(self):
+        ns = load_agents()
+        robot = ns["RobotAgent"].__new__(ns["RobotAgent"])
+        robot.rid = "R1"
+        robot.pool = ThreadPoolExecutor(max_workers=1)
+
+        def fail():
+            raise ConnectionRefusedError("peer is down")
+
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            robot._submit(fail)
+            robot.pool.shutdown(wait=True)
+        self.assertIn("R1: background task failed", err.getvalue())
+        self.assertIn("ConnectionRefusedError: peer is down", err.getvalue())
+
+
+class TriggerNegotiationTest(unittest.TestCase):
+    def test_three_way_tie_pairs_two_robots(self):
+        ns = load_agents()
+        robot_map = {"R1": 6001, "R2": 6002, "R3": 6003}
+        agent = ns["CentralAgent"]([{"task_id": 1, "x": 0, "y": 0}], robot_map, port=0)
+        self.addCleanup(agent.server.close)
+        agent.clients = {rid: rid for rid in robot_map}  # stand-in conns key _outbuf
+        agent._trigger_negotiation(1, ["R3", "R1", "R2"], {rid: 0.5 for rid in robot_map})
+        header = ns["HEADER"].size
+        peers = {rid: msgpack.unpackb(frames[0][header:], raw=False)["content"]["peer_id"]
+                 for rid, frames in agent._outbuf.items()}
+        self.assertEqual(peers, {"R1": "R2", "R2": "R1"})
+
+    def test_responder_in_two_ties_at_once(self):
+        ns = load_agents()
+        for _ in range(10):
+            (r1, c1), (r2, c2), (r3, c3) = (make_robot(ns, rid) for rid in ("R1", "R2", "R3"))
+            try:
+                for central in (c1, c2, c3):
+                    central.settimeout(5.0)
+                # R1 responds to R2 (task 1) and R3 (task 2) concurrently
+                run_negotiations(self, [(r1, r2, 1), (r2, r1, 1), (r1, r3, 2), (r3, r1, 2)], 0.5)
+                self.assertEqual(read_result(ns, c2)["content"]["task_id"], 1)
+                self.assertEqual(read_result(ns, c3)["content"]["task_id"], 2)
+                self.assertEqual(sorted(r1._peers), ["R2", "R3"])
+            finally:
+                for robot, central in ((r1, c1), (r2, c2), (r3, c3)):
+                    close_robot(robot, central)
+
+
+if __name__ == "__main__":
+    unittest.main()